@@ -6,23 +6,44 @@ import os
 from typing import Optional
 
 
-class Config:
+def parse_path_list(value: str) -> frozenset:
+    """Parse a comma-separated list of URL paths, ignoring blanks and whitespace."""
+    return frozenset(path.strip() for path in value.split(",") if path.strip())
+
+
+class _ConfigMeta(type):
+    """Keeps WEBHOOK_SECRET_BYTES in step with every WEBHOOK_SECRET assignment."""
+    
+    def __setattr__(cls, name: str, value) -> None:
+        super().__setattr__(name, value)
+        if name == "WEBHOOK_SECRET":
+            super().__setattr__("WEBHOOK_SECRET_BYTES", value.encode())
+
+
+class Config(metaclass=_ConfigMeta):
     """Application configuration loaded from environment variables."""
     
     # Server Configuration
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
     
-    # Security
+    # Security (assigning WEBHOOK_SECRET also updates WEBHOOK_SECRET_BYTES)
     WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_SECRET_BYTES: bytes = WEBHOOK_SECRET.encode()
     
     # Database
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", "/data/app.db")
     DATABASE_URL: str = os.getenv("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
+    WRITE_BATCH_SIZE: int = int(os.getenv("WRITE_BATCH_SIZE", "100"))
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # json or text
+    LOG_FORMAT_IS_JSON: bool = LOG_FORMAT.lower() == "json"
+    # Paths whose successful requests are not logged (probes, scrapes)
+    LOG_SILENT_PATHS: frozenset = parse_path_list(
+        os.getenv("LOG_SILENT_PATHS", "/health/live,/health/ready,/metrics")
+    )
     
     # Pagination
     DEFAULT_PAGE_LIMIT: int = int(os.getenv("DEFAULT_PAGE_LIMIT", "50"))
@@ -37,14 +58,19 @@ class Config:
         Validate critical configuration.
         Returns True if valid, False otherwise.
         """
-        if not cls.WEBHOOK_SECRET:
+        if not cls.WEBHOOK_SECRET_BYTES:
             return False
         return True
     
+    @classmethod
+    def set_webhook_secret(cls, secret: str) -> None:
+        """Update the webhook secret and its pre-encoded form together."""
+        cls.WEBHOOK_SECRET = secret
+    
     @classmethod
     def is_ready(cls) -> bool:
         """Check if application is ready (has required config)."""
-        return bool(cls.WEBHOOK_SECRET)
+        return bool(cls.WEBHOOK_SECRET_BYTES)
 
 
 # Note: We don't validate on import to allow /health/ready to check
@@ -1,35 +1,73 @@
 """
 Structured JSON logging utilities for request/response tracking.
 """
-import json
+import atexit
 import logging
+import queue
 import sys
 import time
-from datetime import datetime
-from typing import Any, Dict, Optional
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
 from contextvars import ContextVar
 
+import orjson
+
 from app.config import Config
 
 
 # Context variable to store request ID across async contexts
 request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
 
+# Background listener that formats and writes queued records off the request path.
+# While it runs the root logger only has the queue handler; while it is stopped
+# the console handler is attached directly so records are not stranded.
+_listener: Optional[QueueListener] = None
+_listener_running: bool = False
+_queue_handler: Optional[QueueHandler] = None
+_console_handler: Optional[logging.Handler] = None
+
+_request_logger = logging.getLogger("app.request")
+_webhook_logger = logging.getLogger("app.webhook")
+
 
 class JSONFormatter(logging.Formatter):
     """Custom formatter that outputs logs as JSON."""
     
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # (epoch second, formatted "YYYY-MM-DDTHH:MM:SS") of the last record
+        self._ts_cache: Tuple[int, str] = (-1, "")
+    
+    def format_timestamp(self, created: float) -> str:
+        """
+        Format an epoch timestamp as ISO-8601 UTC with microseconds.
+        
+        Microseconds are rounded half-to-even and carried into the next
+        second, matching datetime.fromtimestamp.
+        """
+        second = int(created)
+        micros = round((created - second) * 1_000_000)
+        if micros == 1_000_000:
+            second += 1
+            micros = 0
+        cached_second, prefix = self._ts_cache
+        if second != cached_second:
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._ts_cache = (second, prefix)
+        return f"{prefix}.{micros:06d}Z"
+    
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON."""
         log_data = {
-            "ts": datetime.utcnow().isoformat() + "Z",
+            "ts": self.format_timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
         
-        # Add request ID if available
-        request_id = request_id_var.get()
+        # Add request ID if available (captured by ContextQueueHandler when
+        # the record is formatted on the listener thread)
+        request_id = getattr(record, "request_id", None) or request_id_var.get()
         if request_id:
             log_data["request_id"] = request_id
         
@@ -41,22 +79,39 @@ class JSONFormatter(logging.Formatter):
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
         
-        return json.dumps(log_data)
+        return orjson.dumps(log_data).decode()
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler that defers formatting to the listener thread.
+    
+    The request ID lives in a context variable that is not visible from the
+    listener thread, so it is copied onto the record before enqueueing.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Attach request context and enqueue the record unformatted."""
+        record.request_id = request_id_var.get()
+        return record
 
 
 def setup_logging() -> None:
     """Configure application logging based on config."""
+    global _listener, _queue_handler, _console_handler
+    
     logger = logging.getLogger()
     logger.setLevel(getattr(logging, Config.LOG_LEVEL.upper()))
     
     # Remove existing handlers
+    stop_log_listener()
     logger.handlers.clear()
     
     # Create console handler
     handler = logging.StreamHandler(sys.stdout)
     
     # Set formatter based on config
-    if Config.LOG_FORMAT.lower() == "json":
+    if Config.LOG_FORMAT_IS_JSON:
         handler.setFormatter(JSONFormatter())
     else:
         handler.setFormatter(
@@ -65,7 +120,40 @@ def setup_logging() -> None:
             )
         )
     
-    logger.addHandler(handler)
+    # Request handlers only enqueue records; formatting and stdout writes
+    # happen on the listener thread
+    log_queue = queue.SimpleQueue()
+    _queue_handler = ContextQueueHandler(log_queue)
+    _console_handler = handler
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    start_log_listener()
+
+
+def start_log_listener() -> None:
+    """Start the background log listener if it is not already running."""
+    global _listener_running
+    
+    if _listener is not None and not _listener_running:
+        root = logging.getLogger()
+        root.removeHandler(_console_handler)
+        root.addHandler(_queue_handler)
+        _listener.start()
+        _listener_running = True
+
+
+def stop_log_listener() -> None:
+    """Flush queued records, stop the listener and log directly again."""
+    global _listener_running
+    
+    if _listener is not None and _listener_running:
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        root.addHandler(_console_handler)
+        _listener.stop()
+        _listener_running = False
+
+
+atexit.register(stop_log_listener)
 
 
 def log_request(
@@ -76,7 +164,8 @@ def log_request(
     extra: Optional[Dict[str, Any]] = None
 ) -> None:
     """Log HTTP request with structured data."""
-    logger = logging.getLogger("app.request")
+    if not _request_logger.isEnabledFor(logging.INFO):
+        return
     
     log_data = {
         "method": method,
@@ -88,18 +177,15 @@ def log_request(
     if extra:
         log_data.update(extra)
     
-    # Create a log record with extra fields
-    record = logger.makeRecord(
-        logger.name,
-        logging.INFO,
-        "(log_request)",
-        0,
-        f"{method} {path} {status_code} {latency_ms:.2f}ms",
-        (),
-        None
+    # Message is formatted lazily by the handler
+    _request_logger.info(
+        "%s %s %d %.2fms",
+        method,
+        path,
+        status_code,
+        latency_ms,
+        extra={"extra_fields": log_data}
     )
-    record.extra_fields = log_data
-    logger.handle(record)
 
 
 def log_webhook(
@@ -112,7 +198,8 @@ def log_webhook(
     latency_ms: float
 ) -> None:
     """Log webhook request with specific fields."""
-    logger = logging.getLogger("app.webhook")
+    if not _webhook_logger.isEnabledFor(logging.INFO):
+        return
     
     log_data = {
         "method": method,
@@ -129,18 +216,13 @@ def log_webhook(
     if request_id:
         log_data["request_id"] = request_id
     
-    # Create a log record with extra fields
-    record = logger.makeRecord(
-        logger.name,
-        logging.INFO,
-        "(log_webhook)",
-        0,
-        f"Webhook {message_id} - {result}",
-        (),
-        None
+    # Message is formatted lazily by the handler
+    _webhook_logger.info(
+        "Webhook %s - %s",
+        message_id,
+        result,
+        extra={"extra_fields": log_data}
     )
-    record.extra_fields = log_data
-    logger.handle(record)
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -1,27 +1,43 @@
 """
 FastAPI application with webhook ingestion, message retrieval, and analytics.
 """
+import asyncio
 import hashlib
 import hmac
+import itertools
+import secrets
 import time
-import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional, Tuple, Type, TypeVar
 
+import orjson
 from fastapi import FastAPI, Request, HTTPException, Header, Query, Response
-from fastapi.responses import PlainTextResponse
+from fastapi.exceptions import RequestValidationError
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ValidationError
+from starlette.routing import Match
 
 from app.config import Config
 from app.models import (
     WebhookPayload,
     WebhookResponse,
+    WebhookBatchPayload,
+    WebhookBatchResponse,
     MessageListResponse,
     StatsResponse,
-    HealthResponse,
-    Message
+    HealthResponse
 )
 from app.storage import MessageStorage
-from app.logging_utils import setup_logging, log_request, log_webhook, get_logger, request_id_var
+from app.logging_utils import (
+    setup_logging,
+    start_log_listener,
+    stop_log_listener,
+    log_request,
+    log_webhook,
+    get_logger,
+    request_id_var
+)
 from app.metrics import MetricsCollector, get_metrics
 
 
@@ -29,16 +45,64 @@ from app.metrics import MetricsCollector, get_metrics
 setup_logging()
 logger = get_logger(__name__)
 
+
+class UTCORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that renders UTC datetimes with a "Z" suffix, like Pydantic."""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        )
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Lyftr AI Webhook Service",
     description="Webhook ingestion service with message storage and analytics",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=UTCORJSONResponse
 )
 
 # Initialize storage
 storage = MessageStorage()
 
+# Request IDs: random per-process prefix plus a counter (no syscall per request)
+_request_id_prefix = secrets.token_hex(4)
+_request_id_counter = itertools.count()
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# X-Signature must be exactly a lowercase hex SHA-256 digest
+_SIGNATURE_HEX_LENGTH = hashlib.sha256().digest_size * 2
+_LOWER_HEX_DIGITS = frozenset("0123456789abcdef")
+
+# (secret, HMAC with the key schedule already applied); rebuilt if the secret changes
+_hmac_template: Optional[Tuple[bytes, "hmac.HMAC"]] = None
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Start background workers."""
+    start_log_listener()
+    storage.start_writer()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending writes and log records, then stop background workers."""
+    await storage.stop_writer()
+    stop_log_listener()
+
+
+def _get_hmac_template(secret: bytes) -> "hmac.HMAC":
+    """Return a keyed HMAC-SHA256 template to copy per request."""
+    global _hmac_template
+    
+    if _hmac_template is None or _hmac_template[0] is not secret:
+        _hmac_template = (secret, hmac.new(secret, None, hashlib.sha256))
+    return _hmac_template[1]
+
 
 def verify_signature(payload: bytes, signature: str) -> bool:
     """
@@ -51,22 +115,102 @@ def verify_signature(payload: bytes, signature: str) -> bool:
     Returns:
         True if signature is valid, False otherwise
     """
-    if not Config.WEBHOOK_SECRET:
+    if not Config.WEBHOOK_SECRET_BYTES:
+        return False
+    
+    # Only exact lowercase hex is accepted (bytes.fromhex alone would also
+    # take uppercase and whitespace); raw digests are then compared
+    if len(signature) != _SIGNATURE_HEX_LENGTH or not _LOWER_HEX_DIGITS.issuperset(signature):
         return False
+    provided_digest = bytes.fromhex(signature)
+    
+    # Copying the keyed template reuses the precomputed inner/outer pad
+    # state instead of re-deriving it from the secret on every request
+    mac = _get_hmac_template(Config.WEBHOOK_SECRET_BYTES).copy()
+    mac.update(payload)
+    expected_digest = mac.digest()
+    
+    return hmac.compare_digest(provided_digest, expected_digest)
+
+
+def parse_body(model: Type[ModelT], body: bytes) -> ModelT:
+    """
+    Validate a raw JSON request body against a model.
+    
+    Errors are raised as RequestValidationError with "body" locations, the
+    same 422 response FastAPI produces for declared body parameters.
+    """
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
+
+
+# Models validated by parse_body rather than declared as body parameters, so
+# FastAPI does not add them to the OpenAPI components on its own
+_RAW_BODY_MODELS = (WebhookPayload, WebhookBatchPayload)
+_SCHEMA_REF_TEMPLATE = "#/components/schemas/{model}"
+
+
+def json_body(model: Type[BaseModel]) -> dict:
+    """OpenAPI requestBody for a raw JSON body validated with parse_body."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"$ref": _SCHEMA_REF_TEMPLATE.format(model=model.__name__)}
+                }
+            }
+        }
+    }
+
+
+def custom_openapi() -> dict:
+    """Generate the OpenAPI schema with raw body models in components."""
+    if app.openapi_schema:
+        return app.openapi_schema
     
-    expected_signature = hmac.new(
-        Config.WEBHOOK_SECRET.encode(),
-        payload,
-        hashlib.sha256
-    ).hexdigest()
+    schema = get_openapi(
+        title=app.title,
+        version=app.version,
+        description=app.description,
+        routes=app.routes
+    )
+    components = schema.setdefault("components", {}).setdefault("schemas", {})
+    for model in _RAW_BODY_MODELS:
+        model_schema = model.model_json_schema(ref_template=_SCHEMA_REF_TEMPLATE)
+        components.update(model_schema.pop("$defs", {}))
+        components[model.__name__] = model_schema
+    
+    app.openapi_schema = schema
+    return schema
+
+
+app.openapi = custom_openapi
+
+
+def route_template(request: Request) -> str:
+    """Path template of the route that served a request, or "unmatched"."""
+    route = request.scope.get("route")
+    if route is not None:
+        return route.path
     
-    return hmac.compare_digest(signature, expected_signature)
+    # Only APIRoute records itself in the scope; plain Starlette routes
+    # such as /openapi.json and /docs are matched again here
+    for candidate in app.router.routes:
+        match, _ = candidate.matches(request.scope)
+        if match == Match.FULL:
+            return candidate.path
+    return "unmatched"
 
 
 @app.middleware("http")
 async def logging_middleware(request: Request, call_next):
     """Middleware for request logging and metrics."""
-    request_id = str(uuid.uuid4())
+    request_id = f"{_request_id_prefix}-{next(_request_id_counter):x}"
     request_id_var.set(request_id)
     
     start_time = time.time()
@@ -77,19 +221,24 @@ async def logging_middleware(request: Request, call_next):
     # Calculate duration
     duration_ms = (time.time() - start_time) * 1000
     
-    # Log request (non-webhook endpoints)
-    if request.url.path != "/webhook":
+    path = request.url.path
+    
+    # Log request (non-webhook endpoints); successful probe and scrape
+    # requests on silent paths are not logged
+    silent = path in Config.LOG_SILENT_PATHS and response.status_code < 400
+    if path != "/webhook" and not silent:
         log_request(
             method=request.method,
-            path=request.url.path,
+            path=path,
             status_code=response.status_code,
             latency_ms=duration_ms,
             extra={"request_id": request_id}
         )
     
-    # Record metrics
+    # Record metrics under the matched route template so unknown URLs
+    # cannot create unbounded label values
     MetricsCollector.record_http_request(
-        path=request.url.path,
+        path=route_template(request),
         status=response.status_code,
         duration_ms=duration_ms
     )
@@ -100,26 +249,34 @@ async def logging_middleware(request: Request, call_next):
     return response
 
 
-@app.post("/webhook", response_model=WebhookResponse, status_code=200)
+@app.post(
+    "/webhook",
+    response_model=WebhookResponse,
+    status_code=200,
+    openapi_extra=json_body(WebhookPayload)
+)
 async def webhook_endpoint(
     request: Request,
-    payload: WebhookPayload,
     x_signature: str = Header(..., alias="X-Signature")
 ):
     """
     Webhook endpoint with HMAC-SHA256 signature verification.
     
     Implements idempotent message ingestion using message_id as primary key.
+    The raw body is read once and used both for the signature and for
+    Pydantic's native JSON validation.
     """
     start_time = time.time()
+    
+    # Read raw body once; validation errors still take precedence over 401
+    body = await request.body()
+    payload = parse_body(WebhookPayload, body)
+    
     message_id = payload.message_id
     dup = False
     result = "created"
     
     try:
-        # Get raw body for signature verification
-        body = await request.body()
-        
         # Verify signature
         if not verify_signature(body, x_signature):
             result = "invalid_signature"
@@ -129,7 +286,7 @@ async def webhook_endpoint(
             raise HTTPException(status_code=401, detail="invalid signature")
         
         # Insert message (idempotent operation)
-        was_inserted = storage.insert_message(
+        was_inserted = await storage.insert_message_async(
             message_id=payload.message_id,
             from_msisdn=payload.from_,
             to_msisdn=payload.to,
@@ -147,6 +304,7 @@ async def webhook_endpoint(
         
         # Record metrics
         MetricsCollector.record_webhook_request(result)
+        MetricsCollector.record_webhook_messages(result)
         
         # Log webhook request
         duration_ms = (time.time() - start_time) * 1000
@@ -170,42 +328,114 @@ async def webhook_endpoint(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.post(
+    "/webhook/batch",
+    response_model=WebhookBatchResponse,
+    status_code=200,
+    openapi_extra=json_body(WebhookBatchPayload)
+)
+async def webhook_batch_endpoint(
+    request: Request,
+    x_signature: str = Header(..., alias="X-Signature")
+):
+    """
+    Batch webhook endpoint: {"messages": [...]} with one signature.
+    
+    X-Signature is the HMAC-SHA256 of the whole raw body. All messages are
+    inserted in a single transaction; duplicates are skipped individually.
+    """
+    body = await request.body()
+    batch = parse_body(WebhookBatchPayload, body)
+    
+    if not verify_signature(body, x_signature):
+        MetricsCollector.record_webhook_request("invalid_signature")
+        raise HTTPException(status_code=401, detail="invalid signature")
+    
+    messages = [
+        (m.message_id, m.from_, m.to, m.ts, m.text)
+        for m in batch.messages
+    ]
+    
+    try:
+        # One transaction for the whole batch, off the event loop
+        inserted = await asyncio.to_thread(storage.insert_messages, messages)
+    except Exception as e:
+        MetricsCollector.record_webhook_request("validation_error")
+        logger.error(f"Error processing webhook batch: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+    
+    created = sum(inserted)
+    duplicates = len(inserted) - created
+    
+    MetricsCollector.record_webhook_request("batch")
+    MetricsCollector.record_webhook_messages("created", created)
+    MetricsCollector.record_webhook_messages("duplicate", duplicates)
+    
+    logger.info(
+        f"Webhook batch processed: messages={len(messages)}, "
+        f"created={created}, duplicates={duplicates}"
+    )
+    
+    return WebhookBatchResponse(status="ok", created=created, duplicates=duplicates)
+
+
 @app.get("/messages", response_model=MessageListResponse)
 async def get_messages(
     limit: int = Query(default=50, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
     from_: Optional[str] = Query(default=None, alias="from", description="Filter by sender MSISDN"),
     since: Optional[datetime] = Query(default=None, description="Filter messages since timestamp"),
-    q: Optional[str] = Query(default=None, description="Search query for message text")
+    q: Optional[str] = Query(default=None, description="Search query for message text"),
+    after_ts: Optional[datetime] = Query(default=None, description="Keyset cursor timestamp"),
+    after_message_id: Optional[str] = Query(default=None, description="Keyset cursor message_id")
 ):
     """
     Retrieve messages with pagination and filtering.
     
     Supports:
     - Pagination: limit (1-100, default 50), offset (0+, default 0)
+    - Keyset pagination: after_ts + after_message_id from a previous next_cursor
     - Filtering: from (sender), since (timestamp), q (text search)
     - Deterministic ordering: ts ASC, message_id ASC (oldest first)
     """
+    if (after_ts is None) != (after_message_id is None):
+        raise HTTPException(
+            status_code=422,
+            detail="after_ts and after_message_id must be provided together"
+        )
+    
+    after = (after_ts, after_message_id) if after_ts is not None else None
+    
     try:
         messages, total = storage.get_messages(
             limit=limit,
             offset=offset,
             from_msisdn=from_,
             since=since,
-            search_query=q
+            search_query=q,
+            after=after
         )
         
+        # A full page may be followed by more rows
+        next_cursor = None
+        if len(messages) == limit:
+            last = messages[-1]
+            next_cursor = {"ts": last["ts"], "message_id": last["message_id"]}
+        
         logger.info(
             f"Retrieved {len(messages)} messages "
             f"(limit={limit}, offset={offset}, total={total})"
         )
         
-        return MessageListResponse(
-            data=messages,
-            total=total,
-            limit=limit,
-            offset=offset
-        )
+        # Returned as a response directly: rows are already in the
+        # MessageListResponse shape, so Pydantic serialization is skipped
+        return UTCORJSONResponse({
+            "data": messages,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": next_cursor
+        })
     
     except Exception as e:
         logger.error(f"Error retrieving messages: {e}", exc_info=True)
@@ -285,6 +515,8 @@ async def metrics_endpoint():
     Exposes:
     - http_requests_total: Counter of HTTP requests by path and status
     - webhook_requests_total: Counter of webhook requests by result
+      (a successful batch request counts once as "batch")
+    - webhook_messages_total: Counter of ingested messages by result
     - request_latency_ms: Histogram of request latency in milliseconds
     """
     if not Config.ENABLE_METRICS:
@@ -302,6 +534,7 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "webhook": "POST /webhook",
+            "webhook_batch": "POST /webhook/batch",
             "messages": "GET /messages",
             "stats": "GET /stats",
             "health": {
@@ -15,12 +15,18 @@ http_requests_total = Counter(
     ['path', 'status']
 )
 
-# Webhook processing counters
+# Webhook processing counters: one increment per request, and one per
+# ingested message (a batch request counts once as a request)
 webhook_requests_total = Counter(
     'webhook_requests_total',
     'Total number of webhook requests',
     ['result']
 )
+webhook_messages_total = Counter(
+    'webhook_messages_total',
+    'Total number of webhook messages ingested',
+    ['result']
+)
 
 # Latency histograms with buckets in milliseconds
 request_latency_ms = Histogram(
@@ -46,15 +52,30 @@ class MetricsCollector:
     @staticmethod
     def record_webhook_request(result: str) -> None:
         """
-        Record webhook request metrics.
+        Record one webhook request.
         
         Args:
-            result: One of "created", "duplicate", "invalid_signature", "validation_error"
+            result: One of "created", "duplicate", "batch", "invalid_signature",
+                "validation_error"
         """
         if not Config.ENABLE_METRICS:
             return
         
         webhook_requests_total.labels(result=result).inc()
+    
+    @staticmethod
+    def record_webhook_messages(result: str, count: int = 1) -> None:
+        """
+        Record ingested webhook messages.
+        
+        Args:
+            result: One of "created", "duplicate"
+            count: Number of messages with this result
+        """
+        if not Config.ENABLE_METRICS:
+            return
+        
+        webhook_messages_total.labels(result=result).inc(count)
 
 
 def get_metrics() -> tuple[bytes, str]:
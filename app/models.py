@@ -4,7 +4,6 @@ Pydantic models for request/response validation and data structures.
 from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel, Field, field_validator
-import re
 
 
 class WebhookPayload(BaseModel):
@@ -20,7 +19,7 @@ class WebhookPayload(BaseModel):
     @classmethod
     def validate_message_id(cls, v: str) -> str:
         """Ensure message_id is not empty or whitespace only."""
-        if not v or not v.strip():
+        if not v or v.isspace():
             raise ValueError("message_id cannot be empty or whitespace only")
         return v.strip()
     
@@ -30,7 +29,8 @@ class WebhookPayload(BaseModel):
         """Validate E.164 phone number format: starts with +, then digits only."""
         if not v:
             raise ValueError("Phone number cannot be empty")
-        if not re.match(r'^\+\d+$', v):
+        # Equivalent to ^\+\d+$ without the regex engine (\d == str.isdecimal)
+        if not (v[0] == "+" and v[1:].isdecimal()):
             raise ValueError("Phone number must be in E.164 format (start with + followed by digits)")
         return v
     
@@ -52,6 +52,19 @@ class WebhookResponse(BaseModel):
     status: str = Field(..., description="Processing status")
 
 
+class WebhookBatchPayload(BaseModel):
+    """Several webhook messages delivered and signed as one request body."""
+    
+    messages: List[WebhookPayload] = Field(..., min_length=1, max_length=1000, description="Messages to ingest")
+
+
+class WebhookBatchResponse(BaseModel):
+    """Response for batch webhook endpoint."""
+    status: str = Field(..., description="Processing status")
+    created: int = Field(..., description="Messages inserted")
+    duplicates: int = Field(..., description="Messages skipped because message_id already existed")
+
+
 class Message(BaseModel):
     """Message model for API responses."""
     
@@ -67,6 +80,13 @@ class Message(BaseModel):
         from_attributes = True
 
 
+class MessageCursor(BaseModel):
+    """Keyset cursor pointing at the last message of a page."""
+    
+    ts: datetime
+    message_id: str
+
+
 class MessageListResponse(BaseModel):
     """Paginated message list response."""
     
@@ -74,6 +94,7 @@ class MessageListResponse(BaseModel):
     total: int
     limit: int
     offset: int
+    next_cursor: Optional[MessageCursor] = None
 
 
 class SenderStats(BaseModel):
@@ -2,18 +2,62 @@
 SQLite storage layer with idempotent message ingestion.
 Primary key on message_id ensures idempotency.
 """
+import asyncio
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from app.config import Config
-from app.models import Message, SenderStats
+from app.models import SenderStats
 from app.logging_utils import get_logger
 
 
 logger = get_logger(__name__)
 
+# Applied once to the shared connection
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+# Applied to the read-only connection (journal settings belong to the writer)
+_READ_CONNECTION_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+# (message_id, from_msisdn, to_msisdn, ts, text) as accepted by insert_messages
+NewMessage = Tuple[str, str, str, datetime, Optional[str]]
+
+# Shortest search query the trigram index can match
+_MIN_FTS_QUERY_LENGTH = 3
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Seconds a readiness probe result is reused before the database is queried again
+_HEALTH_CHECK_TTL = 1.0
+
+
+def _dt_to_us(value: datetime) -> int:
+    """Convert a datetime to integer microseconds since the epoch (naive = UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // _ONE_MICROSECOND
+
+
+def _us_to_dt(value: int) -> datetime:
+    """Convert integer microseconds since the epoch to an aware UTC datetime."""
+    return _EPOCH + timedelta(microseconds=value)
+
 
 class MessageStorage:
     """SQLite-based message storage with idempotent operations."""
@@ -21,51 +65,274 @@ class MessageStorage:
     def __init__(self, db_path: str = None):
         """Initialize storage and ensure database exists."""
         self.db_path = db_path or Config.DATABASE_PATH
+        # Writes go through one connection and lock; reads use a separate
+        # read-only connection so WAL lets them proceed during a write
+        self._lock = threading.RLock()
+        self._conn = self._connect()
+        self._read_lock = threading.Lock()
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # Last health check time (monotonic) and result; -inf so the first
+        # probe always measures instead of returning the unset result
+        self._hc_ts = float("-inf")
+        self._hc_ok = False
         self._ensure_database()
+        self._read_conn = self._connect_read_only()
     
-    def _ensure_database(self) -> None:
-        """Create database directory and initialize schema."""
+    def _connect(self) -> sqlite3.Connection:
+        """Open the long-lived shared connection and apply tuning pragmas."""
         # Ensure parent directory exists
         db_file = Path(self.db_path)
         db_file.parent.mkdir(parents=True, exist_ok=True)
         
-        # Initialize schema
-        with self._get_connection() as conn:
+        # Autocommit mode; write transactions are managed explicitly
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def _connect_read_only(self) -> sqlite3.Connection:
+        """Open the long-lived read-only connection used by queries."""
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in _READ_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    @contextmanager
+    def _read_transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run queries against one consistent snapshot on the read connection."""
+        with self._read_lock:
+            self._read_conn.execute("BEGIN")
+            try:
+                yield self._read_conn
+            finally:
+                self._read_conn.execute("COMMIT")
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a write transaction on the shared connection."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+    
+    def _ensure_database(self) -> None:
+        """Initialize schema."""
+        with self._transaction() as conn:
+            legacy = self._detach_legacy_messages(conn)
+            
+            # Timestamps are stored as integer microseconds since the epoch
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS messages (
                     message_id TEXT PRIMARY KEY,
                     from_msisdn TEXT NOT NULL,
                     to_msisdn TEXT NOT NULL,
-                    ts TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
                     text TEXT,
-                    created_at TEXT NOT NULL
+                    created_at INTEGER NOT NULL
                 )
             """)
             
-            # Create indexes for efficient querying
+            # Composite indexes matching ORDER BY ts, message_id so listings
+            # (optionally filtered by sender) need no sort step
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_from_msisdn 
-                ON messages(from_msisdn)
+                CREATE INDEX IF NOT EXISTS idx_ts_mid 
+                ON messages(ts, message_id)
             """)
             
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_ts 
-                ON messages(ts)
+                CREATE INDEX IF NOT EXISTS idx_from_ts_mid 
+                ON messages(from_msisdn, ts, message_id)
             """)
             
+            # Superseded by the composite indexes above
+            conn.execute("DROP INDEX IF EXISTS idx_from_msisdn")
+            conn.execute("DROP INDEX IF EXISTS idx_ts")
+            
             conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_created_at 
                 ON messages(created_at)
             """)
             
-            conn.commit()
-            logger.info(f"Database initialized at {self.db_path}")
+            self._ensure_stats_tables(conn)
+            self._ensure_search_index(conn)
+            
+            if legacy:
+                self._migrate_legacy_messages(conn)
+        
+        logger.info(f"Database initialized at {self.db_path}")
     
-    def _get_connection(self) -> sqlite3.Connection:
-        """Get database connection with row factory."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def _detach_legacy_messages(self, conn: sqlite3.Connection) -> bool:
+        """
+        Move aside a messages table that stores ISO-8601 text timestamps.
+        
+        Derived tables, indexes and triggers are dropped so they are rebuilt
+        against the new schema. Returns True if a legacy table was found.
+        """
+        columns = {
+            row["name"]: row["type"]
+            for row in conn.execute("PRAGMA table_info(messages)")
+        }
+        if columns.get("ts") != "TEXT":
+            return False
+        
+        conn.execute("ALTER TABLE messages RENAME TO messages_legacy")
+        for index in ("idx_from_msisdn", "idx_ts", "idx_ts_mid", "idx_from_ts_mid", "idx_created_at"):
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+        for trigger in ("messages_stats_ai", "messages_fts_ai"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        for table in ("sender_counts", "message_stats", "messages_fts"):
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        return True
+    
+    def _migrate_legacy_messages(self, conn: sqlite3.Connection) -> None:
+        """Copy legacy rows into the new schema, converting timestamps."""
+        rows = conn.execute("""
+            SELECT message_id, from_msisdn, to_msisdn, ts, text, created_at
+            FROM messages_legacy
+        """)
+        conn.executemany(
+            """
+            INSERT INTO messages 
+            (message_id, from_msisdn, to_msisdn, ts, text, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    row["message_id"],
+                    row["from_msisdn"],
+                    row["to_msisdn"],
+                    _dt_to_us(datetime.fromisoformat(row["ts"])),
+                    row["text"],
+                    _dt_to_us(datetime.fromisoformat(row["created_at"]))
+                )
+                for row in rows
+            )
+        )
+        conn.execute("DROP TABLE messages_legacy")
+        logger.info("Migrated messages table to integer timestamps")
+    
+    def _ensure_stats_tables(self, conn: sqlite3.Connection) -> None:
+        """
+        Create incrementally maintained stats tables.
+        
+        An AFTER INSERT trigger keeps per-sender counts and the aggregate
+        row in sync within the inserting transaction, so /stats never scans
+        the messages table.
+        """
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS sender_counts (
+                from_msisdn TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            )
+        """)
+        
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sender_counts_count 
+            ON sender_counts(count DESC, from_msisdn ASC)
+        """)
+        
+        # Single-row aggregate table
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS message_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total_messages INTEGER NOT NULL,
+                senders_count INTEGER NOT NULL,
+                first_ts,
+                last_ts
+            )
+        """)
+        
+        # Backfill from existing messages only when the stats row is missing,
+        # so normal startups skip the full-table aggregate
+        exists = conn.execute(
+            "SELECT 1 FROM message_stats WHERE id = 0"
+        ).fetchone()
+        if exists is None:
+            conn.execute("""
+                INSERT INTO message_stats
+                SELECT 0, COUNT(*), COUNT(DISTINCT from_msisdn), MIN(ts), MAX(ts)
+                FROM messages
+            """)
+            conn.execute("DELETE FROM sender_counts")
+            conn.execute("""
+                INSERT INTO sender_counts (from_msisdn, count)
+                SELECT from_msisdn, COUNT(*) FROM messages GROUP BY from_msisdn
+            """)
+        
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_stats_ai 
+            AFTER INSERT ON messages
+            BEGIN
+                UPDATE message_stats SET
+                    total_messages = total_messages + 1,
+                    senders_count = senders_count + NOT EXISTS (
+                        SELECT 1 FROM sender_counts 
+                        WHERE from_msisdn = new.from_msisdn
+                    ),
+                    first_ts = COALESCE(MIN(first_ts, new.ts), new.ts),
+                    last_ts = COALESCE(MAX(last_ts, new.ts), new.ts)
+                WHERE id = 0;
+                
+                INSERT INTO sender_counts (from_msisdn, count) 
+                VALUES (new.from_msisdn, 1)
+                ON CONFLICT(from_msisdn) DO UPDATE SET count = count + 1;
+            END
+        """)
+    
+    def _ensure_search_index(self, conn: sqlite3.Connection) -> None:
+        """
+        Create the FTS5 index used for text search.
+        
+        The trigram tokenizer keeps the substring semantics of the previous
+        LIKE '%q%' search while serving it from an inverted index. Rows are
+        keyed by message_id rather than rowid, which VACUUM may renumber.
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+        ).fetchone()
+        if exists:
+            return
+        
+        conn.execute("""
+            CREATE VIRTUAL TABLE messages_fts USING fts5(
+                message_id UNINDEXED,
+                text,
+                tokenize = 'trigram'
+            )
+        """)
+        
+        conn.execute("""
+            INSERT INTO messages_fts (message_id, text)
+            SELECT message_id, text FROM messages WHERE text IS NOT NULL
+        """)
+        
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS messages_fts_ai 
+            AFTER INSERT ON messages
+            WHEN new.text IS NOT NULL
+            BEGIN
+                INSERT INTO messages_fts (message_id, text) 
+                VALUES (new.message_id, new.text);
+            END
+        """)
     
     def insert_message(
         self,
@@ -81,30 +348,131 @@ class MessageStorage:
         Returns:
             True if message was inserted, False if it already existed.
         """
-        try:
-            with self._get_connection() as conn:
-                conn.execute(
+        return self.insert_messages([(message_id, from_msisdn, to_msisdn, ts, text)])[0]
+    
+    def insert_messages(self, messages: Sequence[NewMessage]) -> List[bool]:
+        """
+        Insert a batch of messages in a single transaction.
+        
+        Args:
+            messages: (message_id, from_msisdn, to_msisdn, ts, text) tuples
+        
+        Returns:
+            Per-message flags: True if inserted, False if it already existed.
+        """
+        results = []
+        created_at = _dt_to_us(datetime.now(timezone.utc))
+        
+        with self._transaction() as conn:
+            for message_id, from_msisdn, to_msisdn, ts, text in messages:
+                # Duplicates are skipped by the PRIMARY KEY conflict clause
+                # rather than raised; only message_id conflicts are ignored
+                cursor = conn.execute(
                     """
                     INSERT INTO messages 
                     (message_id, from_msisdn, to_msisdn, ts, text, created_at)
                     VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(message_id) DO NOTHING
                     """,
                     (
                         message_id,
                         from_msisdn,
                         to_msisdn,
-                        ts.isoformat(),
+                        _dt_to_us(ts),
                         text,
-                        datetime.utcnow().isoformat()
+                        created_at
                     )
                 )
-                conn.commit()
-                logger.info(f"Inserted new message: {message_id}")
-                return True
-        except sqlite3.IntegrityError:
-            # Message already exists (duplicate message_id)
-            logger.info(f"Message already exists: {message_id}")
-            return False
+                inserted = cursor.rowcount == 1
+                if inserted:
+                    logger.info(f"Inserted new message: {message_id}")
+                else:
+                    logger.info(f"Message already exists: {message_id}")
+                results.append(inserted)
+        
+        return results
+    
+    async def insert_message_async(
+        self,
+        message_id: str,
+        from_msisdn: str,
+        to_msisdn: str,
+        ts: datetime,
+        text: Optional[str] = None
+    ) -> bool:
+        """
+        Insert message through the write coalescer.
+        
+        Concurrent callers are batched into one transaction by the writer
+        task. Falls back to a direct insert when the writer is not running.
+        
+        Returns:
+            True if message was inserted, False if it already existed.
+        """
+        message = (message_id, from_msisdn, to_msisdn, ts, text)
+        
+        if not self._writer_running_here():
+            return self.insert_messages([message])[0]
+        
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait((message, future))
+        return await future
+    
+    def start_writer(self) -> None:
+        """Start the background write coalescer on the running event loop."""
+        if self._writer_task is not None:
+            return
+        
+        self._write_queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+    
+    async def stop_writer(self) -> None:
+        """Drain queued writes and stop the write coalescer."""
+        if not self._writer_running_here():
+            return
+        
+        task, self._writer_task = self._writer_task, None
+        self._write_queue.put_nowait(None)
+        await task
+    
+    def _writer_running_here(self) -> bool:
+        """Check whether the writer task belongs to the running event loop."""
+        return (
+            self._writer_task is not None
+            and self._writer_task.get_loop() is asyncio.get_running_loop()
+        )
+    
+    async def _writer_loop(self) -> None:
+        """Drain queued inserts in batches, one transaction per batch."""
+        queue = self._write_queue
+        stopping = False
+        
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                break
+            
+            batch = [item]
+            while len(batch) < Config.WRITE_BATCH_SIZE and not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            try:
+                results = await asyncio.to_thread(
+                    self.insert_messages, [message for message, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), inserted in zip(batch, results):
+                if not future.done():
+                    future.set_result(inserted)
     
     def get_messages(
         self,
@@ -112,15 +480,20 @@ class MessageStorage:
         offset: int = 0,
         from_msisdn: Optional[str] = None,
         since: Optional[datetime] = None,
-        search_query: Optional[str] = None
-    ) -> Tuple[List[Message], int]:
+        search_query: Optional[str] = None,
+        after: Optional[Tuple[datetime, str]] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
         """
         Retrieve messages with pagination and filtering.
         
+        When ``after`` is given as a (ts, message_id) keyset cursor, only
+        messages ordered strictly after it are returned. The total count
+        covers the filters only, not the cursor.
+        
         Returns:
-            Tuple of (messages list, total count)
+            Tuple of (message dicts shaped like Message, total count)
         """
-        with self._get_connection() as conn:
+        with self._read_transaction() as conn:
             # Build WHERE clause
             where_clauses = []
             params = []
@@ -131,11 +504,20 @@ class MessageStorage:
             
             if since:
                 where_clauses.append("ts >= ?")
-                params.append(since.isoformat())
+                params.append(_dt_to_us(since))
             
             if search_query:
-                where_clauses.append("text LIKE ?")
-                params.append(f"%{search_query}%")
+                if len(search_query) >= _MIN_FTS_QUERY_LENGTH:
+                    # Quote as a single FTS5 string so operators are literal
+                    where_clauses.append(
+                        "message_id IN (SELECT message_id FROM messages_fts "
+                        "WHERE messages_fts MATCH ?)"
+                    )
+                    params.append('"' + search_query.replace('"', '""') + '"')
+                else:
+                    # Trigram index cannot serve queries shorter than 3 chars
+                    where_clauses.append("text LIKE ?")
+                    params.append(f"%{search_query}%")
             
             where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
             
@@ -143,6 +525,11 @@ class MessageStorage:
             count_query = f"SELECT COUNT(*) as total FROM messages WHERE {where_sql}"
             total = conn.execute(count_query, params).fetchone()["total"]
             
+            # Keyset cursor: a range seek on the (ts, message_id) indexes
+            if after:
+                where_sql += " AND (ts, message_id) > (?, ?)"
+                params.extend([_dt_to_us(after[0]), after[1]])
+            
             # Get paginated results with deterministic ordering (ASC - oldest first)
             query = f"""
                 SELECT message_id, from_msisdn, to_msisdn, ts, text, created_at
@@ -155,15 +542,16 @@ class MessageStorage:
             
             rows = conn.execute(query, params).fetchall()
             
+            # Plain dicts in the API shape of Message, serialized directly
             messages = [
-                Message(
-                    message_id=row["message_id"],
-                    from_=row["from_msisdn"],
-                    to=row["to_msisdn"],
-                    ts=datetime.fromisoformat(row["ts"]),
-                    text=row["text"],
-                    created_at=datetime.fromisoformat(row["created_at"])
-                )
+                {
+                    "message_id": row["message_id"],
+                    "from": row["from_msisdn"],
+                    "to": row["to_msisdn"],
+                    "ts": _us_to_dt(row["ts"]),
+                    "text": row["text"],
+                    "created_at": _us_to_dt(row["created_at"])
+                }
                 for row in rows
             ]
             
@@ -177,20 +565,18 @@ class MessageStorage:
             Dictionary with total_messages, senders_count, messages_per_sender,
             first_message_ts, and last_message_ts.
         """
-        with self._get_connection() as conn:
-            # Total messages
-            total = conn.execute("SELECT COUNT(*) as count FROM messages").fetchone()["count"]
-            
-            # Unique senders count
-            senders = conn.execute(
-                "SELECT COUNT(DISTINCT from_msisdn) as count FROM messages"
-            ).fetchone()["count"]
+        with self._read_transaction() as conn:
+            # Totals and timestamp bounds from the aggregate row
+            summary = conn.execute("""
+                SELECT total_messages, senders_count, first_ts, last_ts
+                FROM message_stats
+                WHERE id = 0
+            """).fetchone()
             
             # Top 10 senders by message count (deterministic ordering)
             top_senders = conn.execute("""
-                SELECT from_msisdn, COUNT(*) as count
-                FROM messages
-                GROUP BY from_msisdn
+                SELECT from_msisdn, count
+                FROM sender_counts
                 ORDER BY count DESC, from_msisdn ASC
                 LIMIT 10
             """).fetchall()
@@ -200,36 +586,55 @@ class MessageStorage:
                 for row in top_senders
             ]
             
-            # First and last message timestamps
-            timestamps = conn.execute("""
-                SELECT 
-                    MIN(ts) as first_ts,
-                    MAX(ts) as last_ts
-                FROM messages
-            """).fetchone()
-            
             first_ts = None
             last_ts = None
             
-            if timestamps["first_ts"]:
-                first_ts = datetime.fromisoformat(timestamps["first_ts"])
-            if timestamps["last_ts"]:
-                last_ts = datetime.fromisoformat(timestamps["last_ts"])
+            if summary["first_ts"] is not None:
+                first_ts = _us_to_dt(summary["first_ts"])
+            if summary["last_ts"] is not None:
+                last_ts = _us_to_dt(summary["last_ts"])
             
             return {
-                "total_messages": total,
-                "senders_count": senders,
+                "total_messages": summary["total_messages"],
+                "senders_count": summary["senders_count"],
                 "messages_per_sender": messages_per_sender,
                 "first_message_ts": first_ts,
                 "last_message_ts": last_ts
             }
     
+    def clear(self) -> None:
+        """Delete all messages and reset the derived stats and search tables."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM messages")
+            conn.execute("DELETE FROM messages_fts")
+            conn.execute("DELETE FROM sender_counts")
+            conn.execute("""
+                UPDATE message_stats SET
+                    total_messages = 0,
+                    senders_count = 0,
+                    first_ts = NULL,
+                    last_ts = NULL
+            """)
+    
     def health_check(self) -> bool:
-        """Check if database is accessible."""
+        """
+        Check if database is accessible.
+        
+        Reads the schema version from the database header on the read-only
+        connection, so probes never wait on the write lock; the result is
+        cached for _HEALTH_CHECK_TTL seconds so frequent probes stay cheap.
+        """
+        now = time.monotonic()
+        if now - self._hc_ts < _HEALTH_CHECK_TTL:
+            return self._hc_ok
+        
         try:
-            with self._get_connection() as conn:
-                conn.execute("SELECT 1").fetchone()
-            return True
+            with self._read_lock:
+                self._read_conn.execute("PRAGMA schema_version").fetchone()
+            self._hc_ok = True
         except Exception as e:
             logger.error(f"Database health check failed: {e}")
-            return False
+            self._hc_ok = False
+        
+        self._hc_ts = now
+        return self._hc_ok
@@ -0,0 +1,18 @@
+"""
+Shared HTTP client for the example scripts.
+"""
+import importlib.util
+
+import httpx
+
+
+# HTTP/2 is negotiated only when the optional h2 package is installed
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Shared client: pooled keep-alive connections, HTTP/2 when h2 is installed
+# and the server supports it, and retries on failed connection attempts
+CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(http2=HTTP2, retries=3),
+    limits=httpx.Limits(max_connections=16),
+    timeout=5.0
+)
@@ -2,27 +2,40 @@
 """
 Script to query messages and stats from the API.
 """
-import requests
 import json
 from datetime import datetime, timedelta
 
+from example_client import CLIENT
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
+
+def _json(response):
+    """Decode a JSON response body, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return json.loads(response.content)
+
 
 def get_messages(base_url: str, **params):
     """Retrieve messages with optional filters."""
-    response = requests.get(f"{base_url}/messages", params=params)
+    response = CLIENT.get(f"{base_url}/messages", params=params)
     return response
 
 
 def get_stats(base_url: str):
     """Get analytics statistics."""
-    response = requests.get(f"{base_url}/stats")
+    response = CLIENT.get(f"{base_url}/stats")
     return response
 
 
 def get_health(base_url: str):
     """Check service health."""
-    live = requests.get(f"{base_url}/health/live")
-    ready = requests.get(f"{base_url}/health/ready")
+    live = CLIENT.get(f"{base_url}/health/live")
+    ready = CLIENT.get(f"{base_url}/health/ready")
     return live, ready
 
 
@@ -38,8 +51,8 @@ if __name__ == "__main__":
     print("-" * 60)
     try:
         live, ready = get_health(BASE_URL)
-        print(f"Liveness: {live.status_code} - {live.json()}")
-        print(f"Readiness: {ready.status_code} - {ready.json()}")
+        print(f"Liveness: {live.status_code} - {_json(live)}")
+        print(f"Readiness: {ready.status_code} - {_json(ready)}")
     except Exception as e:
         print(f"❌ Error: {e}")
         exit(1)
@@ -49,7 +62,7 @@ if __name__ == "__main__":
     print("-" * 60)
     response = get_messages(BASE_URL, limit=10)
     if response.status_code == 200:
-        data = response.json()
+        data = _json(response)
         print(f"Total messages: {data['total']}")
         print(f"Returned: {len(data['data'])}")
         for msg in data['data'][:3]:  # Show first 3
@@ -63,7 +76,7 @@ if __name__ == "__main__":
     print("-" * 60)
     response = get_messages(BASE_URL, **{"from": "+919876543210"})
     if response.status_code == 200:
-        data = response.json()
+        data = _json(response)
         print(f"Messages from +919876543210: {data['total']}")
     
     # Search content
@@ -71,7 +84,7 @@ if __name__ == "__main__":
     print("-" * 60)
     response = get_messages(BASE_URL, q="hello")
     if response.status_code == 200:
-        data = response.json()
+        data = _json(response)
         print(f"Messages containing 'hello': {data['total']}")
     
     # Filter by timestamp
@@ -80,7 +93,7 @@ if __name__ == "__main__":
     since = (datetime.utcnow() - timedelta(hours=1)).isoformat() + "Z"
     response = get_messages(BASE_URL, since=since)
     if response.status_code == 200:
-        data = response.json()
+        data = _json(response)
         print(f"Messages in last hour: {data['total']}")
     
     # Get statistics
@@ -88,7 +101,7 @@ if __name__ == "__main__":
     print("-" * 60)
     response = get_stats(BASE_URL)
     if response.status_code == 200:
-        stats = response.json()
+        stats = _json(response)
         print(f"Total messages: {stats['total_messages']}")
         print(f"Unique senders: {stats['senders_count']}")
         print(f"\nTop senders:")
@@ -5,9 +5,11 @@ Example script to test webhook endpoint with proper signature.
 import hashlib
 import hmac
 import json
-import requests
+import httpx
 from datetime import datetime
 
+from example_client import CLIENT
+
 
 def generate_signature(payload: dict, secret: str) -> str:
     """Generate HMAC-SHA256 signature for payload."""
@@ -25,10 +27,10 @@ def send_webhook(base_url: str, secret: str, message_data: dict):
     # Generate signature
     signature = generate_signature(message_data, secret)
     
-    # Send request
-    response = requests.post(
+    # Send the exact bytes that were signed
+    response = CLIENT.post(
         f"{base_url}/webhook",
-        json=message_data,
+        content=json.dumps(message_data, separators=(',', ':')).encode(),
         headers={
             "Content-Type": "application/json",
             "X-Signature": signature
@@ -66,7 +68,7 @@ if __name__ == "__main__":
         else:
             print(f"\n❌ Error: {response.status_code}")
             
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         print("\n❌ Error: Could not connect to server. Is it running?")
         print(f"   Try: make up")
     except Exception as e:
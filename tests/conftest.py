@@ -0,0 +1,118 @@
+"""
+Shared test fixtures and helpers for signing and posting webhook payloads.
+"""
+import hashlib
+import hmac
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as app_main
+from app.main import app
+from app.config import Config
+from app.storage import MessageStorage
+
+
+@pytest.fixture(scope="session")
+def test_storage(tmp_path_factory):
+    """Back the app with a throwaway database instead of DATABASE_PATH."""
+    storage = MessageStorage(str(tmp_path_factory.mktemp("db") / "test.db"))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(app_main, "storage", storage)
+        yield storage
+
+
+@pytest.fixture(scope="session")
+def client(test_storage):
+    """Create one test client; app startup and shutdown run once per session."""
+    Config.set_webhook_secret("testsecret")
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(autouse=True)
+def clean_storage(test_storage):
+    """Start every test with an empty message store."""
+    test_storage.clear()
+
+
+def canonical_body(payload: dict) -> bytes:
+    """Serialize a payload to the compact, key-sorted JSON bytes that get signed."""
+    return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+
+
+TEST_SECRET = b"testsecret"
+
+# OpenSSL-backed constructor (openssl_sha256), bound once
+_SHA = hashlib.sha256
+
+# Keyed once; copies skip re-deriving the inner/outer pads per signature
+_HMAC_TEMPLATE = hmac.new(TEST_SECRET, b"", _SHA)
+
+
+@lru_cache(maxsize=4096)
+def _sign_body(secret: bytes, body: bytes) -> str:
+    """HMAC-SHA256 hex digest of body; repeated payloads hit the cache."""
+    if secret == TEST_SECRET:
+        mac = _HMAC_TEMPLATE.copy()
+        mac.update(body)
+        return mac.hexdigest()
+    # One-shot C implementation; no Python HMAC object is built
+    return hmac.digest(secret, body, _SHA).hex()
+
+
+def generate_signature(payload: dict, secret: str) -> str:
+    """Generate HMAC-SHA256 signature for payload."""
+    return _sign_body(secret.encode(), canonical_body(payload))
+
+
+def post_webhook(client, payload: dict, signature: str, path: str = "/webhook"):
+    """POST the canonical payload bytes with the given X-Signature."""
+    return client.post(
+        path,
+        content=canonical_body(payload),
+        headers={"Content-Type": "application/json", "X-Signature": signature}
+    )
+
+
+def iso_z(value: datetime) -> str:
+    """Format an aware UTC datetime as ISO-8601 with a "Z" suffix."""
+    return value.isoformat().replace("+00:00", "Z")
+
+
+def utc_now() -> datetime:
+    """Current time as an aware UTC datetime."""
+    return datetime.now(timezone.utc)
+
+
+def make_message(message_id: str, from_msisdn: str, to_msisdn: str, text: str, ts: str = None) -> dict:
+    """Build a webhook message payload."""
+    if ts is None:
+        ts = iso_z(utc_now())
+    
+    return {
+        "message_id": message_id,
+        "from": from_msisdn,
+        "to": to_msisdn,
+        "ts": ts,
+        "text": text
+    }
+
+
+def insert_test_message(client, message_id: str, from_msisdn: str, to_msisdn: str, text: str, ts: str = None) -> bool:
+    """Insert a single test message through POST /webhook."""
+    payload = make_message(message_id, from_msisdn, to_msisdn, text, ts)
+    signature = generate_signature(payload, "testsecret")
+    response = post_webhook(client, payload, signature)
+    return response.status_code == 200
+
+
+def insert_test_messages(client, payloads: list) -> bool:
+    """Insert several messages with one signed /webhook/batch request."""
+    batch = {"messages": payloads}
+    signature = generate_signature(batch, "testsecret")
+    response = post_webhook(client, batch, signature, path="/webhook/batch")
+    return response.status_code == 200
@@ -0,0 +1,78 @@
+"""
+Tests for JSON log formatting and background log listener lifecycle.
+"""
+import logging
+from datetime import datetime, timezone
+
+import app.main
+from app import logging_utils
+from app.config import Config, parse_path_list
+
+
+def test_stopped_listener_logs_directly():
+    """Test that stopping the listener swaps the queue handler for the console handler."""
+    root = logging.getLogger()
+    
+    logging_utils.stop_log_listener()
+    try:
+        assert logging_utils._queue_handler not in root.handlers
+        assert logging_utils._console_handler in root.handlers
+    finally:
+        logging_utils.start_log_listener()
+    
+    assert logging_utils._queue_handler in root.handlers
+    assert logging_utils._console_handler not in root.handlers
+
+
+def test_format_timestamp_matches_datetime():
+    """Test that cached timestamps round like datetime.fromtimestamp, across second boundaries."""
+    formatter = logging_utils.JSONFormatter()
+    
+    # Ascending so consecutive values exercise both the cache hit and
+    # the cache refresh (including a carry into the next second)
+    for created in (
+        1700000000.0,
+        1700000000.25,
+        1700000000.9999994,
+        1700000000.9999996,
+        1700000001.000001,
+        1700000001.5,
+        1700000002.123456,
+    ):
+        expected = datetime.fromtimestamp(created, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        assert formatter.format_timestamp(created) == expected
+
+
+def test_parse_silent_paths():
+    """Test LOG_SILENT_PATHS parsing trims whitespace and drops empty entries."""
+    assert parse_path_list(" /health/live, ,/metrics ,") == frozenset({"/health/live", "/metrics"})
+    assert parse_path_list("") == frozenset()
+
+
+def test_silent_paths_skip_only_successful_requests(client, monkeypatch):
+    """Test that successful probes are not logged but failing ones are."""
+    logged = []
+    monkeypatch.setattr(app.main, "log_request", lambda **kwargs: logged.append(kwargs))
+    
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    assert "X-Request-ID" in response.headers
+    assert logged == []
+    
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", "")
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert "X-Request-ID" in response.headers
+    assert [(entry["path"], entry["status_code"]) for entry in logged] == [("/health/ready", 503)]
+    assert logged[0]["extra"]["request_id"] == response.headers["X-Request-ID"]
+
+
+def test_silent_paths_are_configurable(client, monkeypatch):
+    """Test that the middleware follows Config.LOG_SILENT_PATHS."""
+    logged = []
+    monkeypatch.setattr(app.main, "log_request", lambda **kwargs: logged.append(kwargs))
+    monkeypatch.setattr(Config, "LOG_SILENT_PATHS", parse_path_list("/"))
+    
+    assert client.get("/").status_code == 200
+    assert client.get("/health/live").status_code == 200
+    assert [entry["path"] for entry in logged] == ["/health/live"]
@@ -1,58 +1,15 @@
 """
 Tests for message retrieval endpoint with pagination and filtering.
 """
-import hashlib
-import hmac
-import json
-from datetime import datetime, timedelta
-
-import pytest
-from fastapi.testclient import TestClient
-
-from app.main import app
-from app.config import Config
-
-
-@pytest.fixture
-def client():
-    """Create test client."""
-    Config.WEBHOOK_SECRET = "testsecret"
-    return TestClient(app)
-
-
-def generate_signature(payload: dict, secret: str) -> str:
-    """Generate HMAC-SHA256 signature for payload."""
-    payload_bytes = json.dumps(payload, separators=(',', ':')).encode()
-    signature = hmac.new(
-        secret.encode(),
-        payload_bytes,
-        hashlib.sha256
-    ).hexdigest()
-    return signature
-
-
-def insert_test_message(client, message_id: str, from_msisdn: str, to_msisdn: str, text: str, ts: str = None):
-    """Helper to insert a test message."""
-    if ts is None:
-        ts = datetime.utcnow().isoformat() + "Z"
-    
-    payload = {
-        "message_id": message_id,
-        "from": from_msisdn,
-        "to": to_msisdn,
-        "ts": ts,
-        "text": text
-    }
-    
-    signature = generate_signature(payload, "testsecret")
-    
-    response = client.post(
-        "/webhook",
-        json=payload,
-        headers={"X-Signature": signature}
-    )
-    
-    return response.status_code == 200
+from datetime import timedelta
+
+from tests.conftest import (
+    insert_test_message,
+    insert_test_messages,
+    iso_z,
+    make_message,
+    utc_now
+)
 
 
 def test_get_messages_empty(client):
@@ -68,14 +25,10 @@ def test_get_messages_empty(client):
 def test_get_messages_default_pagination(client):
     """Test default pagination (limit=50, offset=0)."""
     # Insert a few messages
-    for i in range(5):
-        insert_test_message(
-            client,
-            f"msg_default_{i}",
-            "+919876543210",
-            "+14155550100",
-            f"Message {i}"
-        )
+    assert insert_test_messages(client, [
+        make_message(f"msg_default_{i}", "+919876543210", "+14155550100", f"Message {i}")
+        for i in range(5)
+    ])
     
     response = client.get("/messages")
     assert response.status_code == 200
@@ -88,14 +41,10 @@ def test_get_messages_default_pagination(client):
 def test_get_messages_custom_pagination(client):
     """Test custom pagination."""
     # Insert test messages
-    for i in range(10):
-        insert_test_message(
-            client,
-            f"msg_page_{i}",
-            "+919876543210",
-            "+14155550100",
-            f"Message {i}"
-        )
+    assert insert_test_messages(client, [
+        make_message(f"msg_page_{i}", "+919876543210", "+14155550100", f"Message {i}")
+        for i in range(10)
+    ])
     
     # Get first page with limit=5
     response = client.get("/messages?limit=5&offset=0")
@@ -125,7 +74,7 @@ def test_get_messages_filter_by_from(client):
 
 def test_get_messages_filter_by_since(client):
     """Test filtering messages by timestamp."""
-    now = datetime.utcnow()
+    now = utc_now()
     past = now - timedelta(hours=2)
     future = now + timedelta(hours=2)
     
@@ -136,7 +85,7 @@ def test_get_messages_filter_by_since(client):
         "+919876543210",
         "+14155550100",
         "Past",
-        past.isoformat() + "Z"
+        iso_z(past)
     )
     insert_test_message(
         client,
@@ -144,11 +93,11 @@ def test_get_messages_filter_by_since(client):
         "+919876543210",
         "+14155550100",
         "Future",
-        future.isoformat() + "Z"
+        iso_z(future)
     )
     
     # Filter messages since now
-    response = client.get(f"/messages?since={now.isoformat()}Z")
+    response = client.get(f"/messages?since={iso_z(now)}")
     assert response.status_code == 200
     data = response.json()
     
@@ -171,14 +120,51 @@ def test_get_messages_search_text(client):
     assert data["total"] >= 2
 
 
+def test_get_messages_search_substring_case_insensitive(client):
+    """Test that search matches inside words and ignores case."""
+    assert insert_test_messages(client, [
+        make_message("msg_sub_1", "+919876543210", "+14155550100", "Hello world"),
+        make_message("msg_sub_2", "+919876543210", "+14155550100", "Goodbye WORLDWIDE"),
+        make_message("msg_sub_3", "+919876543210", "+14155550100", "Something else"),
+    ])
+    
+    for q in ("orld", "WORLD", "wOrLd"):
+        response = client.get("/messages", params={"q": q})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 2
+        assert {m["message_id"] for m in data["data"]} == {"msg_sub_1", "msg_sub_2"}
+
+
+def test_get_messages_search_short_query(client):
+    """Test that queries shorter than 3 characters still match substrings."""
+    assert insert_test_messages(client, [
+        make_message("msg_short_1", "+919876543210", "+14155550100", "Hello world"),
+        make_message("msg_short_2", "+919876543210", "+14155550100", "Ok"),
+        make_message("msg_short_3", "+919876543210", "+14155550100", "Something else"),
+    ])
+    
+    response = client.get("/messages", params={"q": "ld"})
+    assert response.status_code == 200
+    assert [m["message_id"] for m in response.json()["data"]] == ["msg_short_1"]
+    
+    response = client.get("/messages", params={"q": "o"})
+    assert response.status_code == 200
+    assert response.json()["total"] == 3
+    
+    response = client.get("/messages", params={"q": "OK"})
+    assert response.status_code == 200
+    assert [m["message_id"] for m in response.json()["data"]] == ["msg_short_2"]
+
+
 def test_get_messages_ordering(client):
     """Test that messages are ordered by ts ASC, message_id ASC."""
-    now = datetime.utcnow()
+    now = utc_now()
     
     # Insert messages with specific timestamps
-    ts1 = (now - timedelta(hours=2)).isoformat() + "Z"
-    ts2 = (now - timedelta(hours=1)).isoformat() + "Z"
-    ts3 = now.isoformat() + "Z"
+    ts1 = iso_z(now - timedelta(hours=2))
+    ts2 = iso_z(now - timedelta(hours=1))
+    ts3 = iso_z(now)
     
     insert_test_message(client, "msg_order_3", "+919876543210", "+14155550100", "Third", ts3)
     insert_test_message(client, "msg_order_1", "+919876543210", "+14155550100", "First", ts1)
@@ -222,7 +208,7 @@ def test_get_messages_offset_validation(client):
 
 def test_get_messages_combined_filters(client):
     """Test combining multiple filters."""
-    now = datetime.utcnow()
+    now = utc_now()
     
     insert_test_message(
         client,
@@ -230,7 +216,7 @@ def test_get_messages_combined_filters(client):
         "+911234567890",
         "+14155550100",
         "Important update",
-        now.isoformat() + "Z"
+        iso_z(now)
     )
     
     # Combine from + q filters
@@ -240,3 +226,49 @@ def test_get_messages_combined_filters(client):
     
     # Should find the message
     assert data["total"] >= 1
+
+
+def test_get_messages_keyset_pagination(client):
+    """Test walking pages with the next_cursor keyset cursor."""
+    assert insert_test_messages(client, [
+        make_message(
+            f"msg_keyset_{i}",
+            "+915555555555",
+            "+14155550100",
+            f"Keyset {i}",
+            f"2025-02-01T10:00:0{i}Z"
+        )
+        for i in range(5)
+    ])
+    
+    # First page
+    response = client.get("/messages?from=%2B915555555555&limit=2")
+    assert response.status_code == 200
+    data = response.json()
+    seen = [m["message_id"] for m in data["data"]]
+    cursor = data["next_cursor"]
+    assert cursor is not None
+    
+    # Follow cursors until exhausted
+    while cursor is not None:
+        response = client.get(
+            "/messages",
+            params={
+                "from": "+915555555555",
+                "limit": 2,
+                "after_ts": cursor["ts"],
+                "after_message_id": cursor["message_id"]
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        seen.extend(m["message_id"] for m in data["data"])
+        cursor = data["next_cursor"]
+    
+    assert seen == [f"msg_keyset_{i}" for i in range(5)]
+
+
+def test_get_messages_cursor_requires_both_fields(client):
+    """Test that a partial keyset cursor is rejected."""
+    response = client.get("/messages?after_message_id=m1")
+    assert response.status_code == 422
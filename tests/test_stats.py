@@ -1,58 +1,21 @@
 """
 Tests for analytics/stats endpoint.
 """
-import hashlib
-import hmac
-import json
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-import pytest
-from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
 
-from app.main import app
 from app.config import Config
-
-
-@pytest.fixture
-def client():
-    """Create test client."""
-    Config.WEBHOOK_SECRET = "testsecret"
-    return TestClient(app)
-
-
-def generate_signature(payload: dict, secret: str) -> str:
-    """Generate HMAC-SHA256 signature for payload."""
-    payload_bytes = json.dumps(payload, separators=(',', ':')).encode()
-    signature = hmac.new(
-        secret.encode(),
-        payload_bytes,
-        hashlib.sha256
-    ).hexdigest()
-    return signature
-
-
-def insert_test_message(client, message_id: str, from_msisdn: str, to_msisdn: str, text: str, ts: str = None):
-    """Helper to insert a test message."""
-    if ts is None:
-        ts = datetime.utcnow().isoformat() + "Z"
-    
-    payload = {
-        "message_id": message_id,
-        "from": from_msisdn,
-        "to": to_msisdn,
-        "ts": ts,
-        "text": text
-    }
-    
-    signature = generate_signature(payload, "testsecret")
-    
-    response = client.post(
-        "/webhook",
-        json=payload,
-        headers={"X-Signature": signature}
-    )
-    
-    return response.status_code == 200
+from tests.conftest import (
+    generate_signature,
+    insert_test_message,
+    insert_test_messages,
+    iso_z,
+    make_message,
+    post_webhook,
+    utc_now
+)
 
 
 def test_stats_empty_database(client):
@@ -117,17 +80,12 @@ def test_stats_messages_per_sender(client):
 
 def test_stats_top_10_senders(client):
     """Test that only top 10 senders are returned."""
-    # Insert messages from 15 different senders
-    for i in range(15):
-        count = 15 - i  # Varying message counts
-        for j in range(count):
-            insert_test_message(
-                client,
-                f"msg_top10_{i}_{j}",
-                f"+91{i:010d}",
-                "+14155550100",
-                f"Message {j}"
-            )
+    # Insert messages from 15 different senders with varying counts
+    assert insert_test_messages(client, [
+        make_message(f"msg_top10_{i}_{j}", f"+91{i:010d}", "+14155550100", f"Message {j}")
+        for i in range(15)
+        for j in range(15 - i)
+    ])
     
     response = client.get("/stats")
     assert response.status_code == 200
@@ -139,6 +97,31 @@ def test_stats_top_10_senders(client):
     assert len(messages_per_sender) <= 10
 
 
+def test_stats_concurrent_webhooks(client):
+    """Test that concurrent single-message webhooks are all counted exactly once."""
+    payloads = [
+        make_message(f"msg_conc_{i}", f"+91{i % 5:010d}", "+14155550100", f"Message {i}")
+        for i in range(50)
+    ]
+    
+    def post(payload):
+        return post_webhook(client, payload, generate_signature(payload, "testsecret"))
+    
+    # Independent inserts are issued in parallel, each payload twice
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        responses = list(executor.map(post, payloads + payloads))
+    
+    assert all(r.status_code == 200 for r in responses)
+    
+    response = client.get("/stats")
+    assert response.status_code == 200
+    data = response.json()
+    
+    assert data["total_messages"] == 50
+    assert data["senders_count"] == 5
+    assert [s["count"] for s in data["messages_per_sender"]] == [10] * 5
+
+
 def test_stats_deterministic_ordering(client):
     """Test that senders with same count are ordered alphabetically by 'from'."""
     # Insert messages with same count for multiple senders
@@ -165,7 +148,7 @@ def test_stats_deterministic_ordering(client):
 
 def test_stats_timestamps(client):
     """Test first and last message timestamps."""
-    now = datetime.utcnow()
+    now = utc_now()
     past = now - timedelta(hours=5)
     future = now + timedelta(hours=5)
     
@@ -176,7 +159,7 @@ def test_stats_timestamps(client):
         "+919876543210",
         "+14155550100",
         "Past",
-        past.isoformat() + "Z"
+        iso_z(past)
     )
     insert_test_message(
         client,
@@ -184,7 +167,7 @@ def test_stats_timestamps(client):
         "+919876543210",
         "+14155550100",
         "Now",
-        now.isoformat() + "Z"
+        iso_z(now)
     )
     insert_test_message(
         client,
@@ -192,7 +175,7 @@ def test_stats_timestamps(client):
         "+919876543210",
         "+14155550100",
         "Future",
-        future.isoformat() + "Z"
+        iso_z(future)
     )
     
     response = client.get("/stats")
@@ -210,20 +193,19 @@ def test_stats_after_duplicate_messages(client):
         "message_id": "msg_dup_stats",
         "from": "+919876543210",
         "to": "+14155550100",
-        "ts": datetime.utcnow().isoformat() + "Z",
+        "ts": iso_z(utc_now()),
         "text": "Duplicate test"
     }
     
     signature = generate_signature(payload, "testsecret")
-    headers = {"X-Signature": signature}
     
     # Get initial count
     response = client.get("/stats")
     initial_total = response.json()["total_messages"]
     
     # Send same message twice
-    client.post("/webhook", json=payload, headers=headers)
-    client.post("/webhook", json=payload, headers=headers)
+    post_webhook(client, payload, signature)
+    post_webhook(client, payload, signature)
     
     response = client.get("/stats")
     assert response.status_code == 200
@@ -266,3 +248,33 @@ def test_metrics_endpoint(client):
         assert "webhook_requests_total" in content
     else:
         assert response.status_code == 404
+
+
+def test_metrics_unmatched_path_label(client):
+    """Test that unknown URLs share a single metrics path label."""
+    response = client.get("/does-not-exist/12345")
+    assert response.status_code == 404
+    
+    response = client.get("/metrics")
+    
+    if Config.ENABLE_METRICS:
+        content = response.text
+        assert 'path="unmatched"' in content
+        assert "/does-not-exist/12345" not in content
+
+
+def test_metrics_docs_routes_use_their_own_path(client):
+    """Test that plain Starlette routes like /openapi.json are not counted as unmatched."""
+    def count(path):
+        labels = {"path": path, "status": "200"}
+        return REGISTRY.get_sample_value("http_requests_total", labels) or 0.0
+    
+    openapi_before = count("/openapi.json")
+    unmatched_before = count("unmatched")
+    
+    response = client.get("/openapi.json")
+    assert response.status_code == 200
+    
+    if Config.ENABLE_METRICS:
+        assert count("/openapi.json") == openapi_before + 1
+        assert count("unmatched") == unmatched_before
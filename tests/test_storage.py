@@ -0,0 +1,122 @@
+"""
+Tests for the SQLite storage layer.
+"""
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import app.main
+import app.storage
+from app.config import Config
+from app.storage import MessageStorage
+
+
+def test_reads_do_not_wait_for_write_transaction(tmp_path):
+    """Test that queries proceed on the read connection while a write is open."""
+    storage = MessageStorage(str(tmp_path / "test.db"))
+    storage.insert_messages([
+        ("m1", "+919876543210", "+14155550100", datetime(2025, 1, 15, tzinfo=timezone.utc), "Hello")
+    ])
+    
+    results = []
+    
+    def read():
+        results.append(storage.get_stats()["total_messages"])
+        results.append(storage.get_messages()[1])
+        results.append(storage.health_check())
+    
+    # Hold the write lock and an open write transaction
+    with storage._transaction():
+        reader = threading.Thread(target=read)
+        reader.start()
+        reader.join(timeout=5)
+        
+        assert not reader.is_alive()
+        assert results == [1, 1, True]
+
+
+def test_first_health_check_is_measured(tmp_path, monkeypatch):
+    """Test that the first probe queries the database even at monotonic time 0."""
+    monkeypatch.setattr(app.storage, "time", SimpleNamespace(monotonic=lambda: 0.0))
+    storage = MessageStorage(str(tmp_path / "test.db"))
+    
+    assert storage.health_check() is True
+
+
+def test_stats_backfill_only_when_row_missing(tmp_path):
+    """Test that reopening storage reuses the stats row and backfills a missing one."""
+    db_path = str(tmp_path / "test.db")
+    storage = MessageStorage(db_path)
+    storage.insert_messages([
+        ("m1", "+919876543210", "+14155550100", datetime(2025, 1, 15, tzinfo=timezone.utc), "Hello")
+    ])
+    
+    # An existing row is kept as-is (no aggregate over messages on startup)
+    with storage._transaction() as conn:
+        conn.execute("UPDATE message_stats SET total_messages = 99 WHERE id = 0")
+    assert MessageStorage(db_path).get_stats()["total_messages"] == 99
+    
+    # A missing row is rebuilt from the messages table
+    with storage._transaction() as conn:
+        conn.execute("DELETE FROM message_stats")
+    stats = MessageStorage(db_path).get_stats()
+    assert stats["total_messages"] == 1
+    assert stats["senders_count"] == 1
+
+
+def test_legacy_text_timestamps_are_migrated(tmp_path):
+    """Test that a database with the original TEXT timestamp schema is upgraded in place."""
+    db_path = str(tmp_path / "legacy.db")
+    
+    # Schema and row format written by the original storage layer
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE messages (
+            message_id TEXT PRIMARY KEY,
+            from_msisdn TEXT NOT NULL,
+            to_msisdn TEXT NOT NULL,
+            ts TEXT NOT NULL,
+            text TEXT,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_from_msisdn ON messages(from_msisdn)")
+    conn.execute("CREATE INDEX idx_ts ON messages(ts)")
+    conn.execute("CREATE INDEX idx_created_at ON messages(created_at)")
+    conn.executemany(
+        "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("m1", "+919876543210", "+14155550100", "2025-01-15T10:00:00+00:00", "Hello world", "2025-01-15T10:00:01"),
+            ("m2", "+919876543210", "+14155550100", "2025-01-15T11:00:00+00:00", "Goodbye world", "2025-01-15T11:00:01"),
+            ("m3", "+911234567890", "+14155550100", "2025-01-15T12:00:00+00:00", None, "2025-01-15T12:00:01"),
+        ]
+    )
+    conn.commit()
+    conn.close()
+    
+    storage = MessageStorage(db_path)
+    
+    messages, total = storage.get_messages()
+    assert total == 3
+    assert [m["message_id"] for m in messages] == ["m1", "m2", "m3"]
+    assert messages[0]["ts"] == datetime(2025, 1, 15, 10, tzinfo=timezone.utc)
+    assert messages[2]["text"] is None
+    
+    stats = storage.get_stats()
+    assert stats["total_messages"] == 3
+    assert stats["senders_count"] == 2
+    assert stats["first_message_ts"] == datetime(2025, 1, 15, 10, tzinfo=timezone.utc)
+    assert stats["last_message_ts"] == datetime(2025, 1, 15, 12, tzinfo=timezone.utc)
+    
+    messages, total = storage.get_messages(search_query="orld")
+    assert total == 2
+    assert [m["message_id"] for m in messages] == ["m1", "m2"]
+    
+    # Reopening the migrated database leaves it untouched
+    assert MessageStorage(db_path).get_messages()[1] == 3
+
+
+def test_app_storage_is_not_the_configured_database(client):
+    """Test that the suite never writes to DATABASE_PATH."""
+    assert app.main.storage.db_path != Config.DATABASE_PATH
@@ -1,54 +1,103 @@
 """
 Tests for webhook endpoint including signature verification and idempotency.
 """
-import hashlib
-import hmac
-import json
-from datetime import datetime
+from prometheus_client import REGISTRY
 
-import pytest
-from fastapi.testclient import TestClient
-
-from app.main import app
 from app.config import Config
+from tests.conftest import generate_signature, make_message, post_webhook
+
+
+# Static payloads are known at import time, so they are signed once here
+VALID_PAYLOAD = {
+    "message_id": "m1",
+    "from": "+919876543210",
+    "to": "+14155550100",
+    "ts": "2025-01-15T10:00:00Z",
+    "text": "Hello"
+}
+VALID_SIGNATURE = generate_signature(VALID_PAYLOAD, "testsecret")
+
+INVALID_SIGNATURE_PAYLOAD = {
+    "message_id": "m2",
+    "from": "+919876543210",
+    "to": "+14155550100",
+    "ts": "2025-01-15T10:00:00Z",
+    "text": "Test"
+}
+
+MISSING_SIGNATURE_PAYLOAD = {
+    "message_id": "m3",
+    "from": "+919876543210",
+    "to": "+14155550100",
+    "ts": "2025-01-15T10:00:00Z",
+    "text": "Test"
+}
+
+INVALID_E164_PAYLOAD = {
+    "message_id": "m4",
+    "from": "919876543210",  # Missing +
+    "to": "+14155550100",
+    "ts": "2025-01-15T10:00:00Z",
+    "text": "Test"
+}
+INVALID_E164_SIGNATURE = generate_signature(INVALID_E164_PAYLOAD, "testsecret")
+
+IDEMPOTENT_PAYLOAD = {
+    "message_id": "m_idempotent",
+    "from": "+919876543210",
+    "to": "+14155550100",
+    "ts": "2025-01-15T10:00:00Z",
+    "text": "Idempotency test"
+}
+IDEMPOTENT_SIGNATURE = generate_signature(IDEMPOTENT_PAYLOAD, "testsecret")
+
+MISSING_FIELDS_PAYLOAD = {
+    "message_id": "m5",
+    "from": "+919876543210",
+    # Missing 'to' and 'ts'
+}
+MISSING_FIELDS_SIGNATURE = generate_signature(MISSING_FIELDS_PAYLOAD, "testsecret")
 
+NO_TEXT_PAYLOAD = {
+    "message_id": "m6",
+    "from": "+919876543210",
+    "to": "+14155550100",
+    "ts": "2025-01-15T10:00:00Z"
+    # text is optional
+}
+NO_TEXT_SIGNATURE = generate_signature(NO_TEXT_PAYLOAD, "testsecret")
 
-@pytest.fixture
-def client():
-    """Create test client."""
-    # Ensure WEBHOOK_SECRET is set for tests
-    Config.WEBHOOK_SECRET = "testsecret"
-    return TestClient(app)
+LONG_TEXT = "x" * 5000  # Exceeds 4096 limit
+LONG_TEXT_PAYLOAD = {
+    "message_id": "m7",
+    "from": "+919876543210",
+    "to": "+14155550100",
+    "ts": "2025-01-15T10:00:00Z",
+    "text": LONG_TEXT
+}
+LONG_TEXT_SIGNATURE = generate_signature(LONG_TEXT_PAYLOAD, "testsecret")
 
+BATCH_PAYLOAD = {
+    "messages": [
+        make_message("m_batch_1", "+919876543210", "+14155550100", "One", "2025-01-15T10:00:00Z"),
+        make_message("m_batch_2", "+919876543210", "+14155550100", "Two", "2025-01-15T10:00:01Z"),
+    ]
+}
+BATCH_SIGNATURE = generate_signature(BATCH_PAYLOAD, "testsecret")
 
-def generate_signature(payload: dict, secret: str) -> str:
-    """Generate HMAC-SHA256 signature for payload."""
-    payload_bytes = json.dumps(payload, separators=(',', ':')).encode()
-    signature = hmac.new(
-        secret.encode(),
-        payload_bytes,
-        hashlib.sha256
-    ).hexdigest()
-    return signature
+INVALID_SIGNATURE_BATCH_PAYLOAD = {
+    "messages": [
+        make_message("m_batch_bad", "+919876543210", "+14155550100", "Bad", "2025-01-15T10:00:00Z")
+    ]
+}
+
+EMPTY_BATCH_PAYLOAD = {"messages": []}
+EMPTY_BATCH_SIGNATURE = generate_signature(EMPTY_BATCH_PAYLOAD, "testsecret")
 
 
 def test_webhook_valid_signature(client):
     """Test webhook with valid signature."""
-    payload = {
-        "message_id": "m1",
-        "from": "+919876543210",
-        "to": "+14155550100",
-        "ts": "2025-01-15T10:00:00Z",
-        "text": "Hello"
-    }
-    
-    signature = generate_signature(payload, "testsecret")
-    
-    response = client.post(
-        "/webhook",
-        json=payload,
-        headers={"X-Signature": signature}
-    )
+    response = post_webhook(client, VALID_PAYLOAD, VALID_SIGNATURE)
     
     assert response.status_code == 200
     data = response.json()
@@ -57,17 +106,9 @@ def test_webhook_valid_signature(client):
 
 def test_webhook_invalid_signature(client):
     """Test webhook with invalid signature."""
-    payload = {
-        "message_id": "m2",
-        "from": "+919876543210",
-        "to": "+14155550100",
-        "ts": "2025-01-15T10:00:00Z",
-        "text": "Test"
-    }
-    
     response = client.post(
         "/webhook",
-        json=payload,
+        json=INVALID_SIGNATURE_PAYLOAD,
         headers={"X-Signature": "invalid_signature"}
     )
     
@@ -77,100 +118,41 @@ def test_webhook_invalid_signature(client):
 
 def test_webhook_missing_signature(client):
     """Test webhook without signature header."""
-    payload = {
-        "message_id": "m3",
-        "from": "+919876543210",
-        "to": "+14155550100",
-        "ts": "2025-01-15T10:00:00Z",
-        "text": "Test"
-    }
-    
-    response = client.post("/webhook", json=payload)
+    response = client.post("/webhook", json=MISSING_SIGNATURE_PAYLOAD)
     
     assert response.status_code == 422  # Missing required header
 
 
 def test_webhook_invalid_e164_format(client):
     """Test webhook with invalid E.164 phone number."""
-    payload = {
-        "message_id": "m4",
-        "from": "919876543210",  # Missing +
-        "to": "+14155550100",
-        "ts": "2025-01-15T10:00:00Z",
-        "text": "Test"
-    }
-    
-    signature = generate_signature(payload, "testsecret")
-    
-    response = client.post(
-        "/webhook",
-        json=payload,
-        headers={"X-Signature": signature}
-    )
+    response = post_webhook(client, INVALID_E164_PAYLOAD, INVALID_E164_SIGNATURE)
     
     assert response.status_code == 422  # Validation error
 
 
 def test_webhook_idempotency(client):
     """Test that duplicate messages are handled idempotently."""
-    payload = {
-        "message_id": "m_idempotent",
-        "from": "+919876543210",
-        "to": "+14155550100",
-        "ts": "2025-01-15T10:00:00Z",
-        "text": "Idempotency test"
-    }
-    
-    signature = generate_signature(payload, "testsecret")
-    headers = {"X-Signature": signature}
-    
     # First request
-    response1 = client.post("/webhook", json=payload, headers=headers)
+    response1 = post_webhook(client, IDEMPOTENT_PAYLOAD, IDEMPOTENT_SIGNATURE)
     assert response1.status_code == 200
     assert response1.json()["status"] == "ok"
     
     # Second request with same message_id
-    response2 = client.post("/webhook", json=payload, headers=headers)
+    response2 = post_webhook(client, IDEMPOTENT_PAYLOAD, IDEMPOTENT_SIGNATURE)
     assert response2.status_code == 200
     assert response2.json()["status"] == "ok"
 
 
 def test_webhook_missing_required_fields(client):
     """Test webhook with missing required fields."""
-    payload = {
-        "message_id": "m5",
-        "from": "+919876543210",
-        # Missing 'to' and 'ts'
-    }
-    
-    signature = generate_signature(payload, "testsecret")
-    
-    response = client.post(
-        "/webhook",
-        json=payload,
-        headers={"X-Signature": signature}
-    )
+    response = post_webhook(client, MISSING_FIELDS_PAYLOAD, MISSING_FIELDS_SIGNATURE)
     
     assert response.status_code == 422
 
 
 def test_webhook_optional_text_field(client):
     """Test webhook with optional text field."""
-    payload = {
-        "message_id": "m6",
-        "from": "+919876543210",
-        "to": "+14155550100",
-        "ts": "2025-01-15T10:00:00Z"
-        # text is optional
-    }
-    
-    signature = generate_signature(payload, "testsecret")
-    
-    response = client.post(
-        "/webhook",
-        json=payload,
-        headers={"X-Signature": signature}
-    )
+    response = post_webhook(client, NO_TEXT_PAYLOAD, NO_TEXT_SIGNATURE)
     
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
@@ -178,20 +160,111 @@ def test_webhook_optional_text_field(client):
 
 def test_webhook_text_max_length(client):
     """Test webhook with text exceeding max length."""
-    payload = {
-        "message_id": "m7",
-        "from": "+919876543210",
-        "to": "+14155550100",
-        "ts": "2025-01-15T10:00:00Z",
-        "text": "x" * 5000  # Exceeds 4096 limit
-    }
+    response = post_webhook(client, LONG_TEXT_PAYLOAD, LONG_TEXT_SIGNATURE)
     
-    signature = generate_signature(payload, "testsecret")
+    assert response.status_code == 422
+
+
+def test_webhook_batch(client):
+    """Test batch ingestion with one signature over the whole body."""
+    response = post_webhook(client, BATCH_PAYLOAD, BATCH_SIGNATURE, path="/webhook/batch")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "created": 2, "duplicates": 0}
     
-    response = client.post(
-        "/webhook",
-        json=payload,
-        headers={"X-Signature": signature}
+    # Replaying the batch inserts nothing
+    response = post_webhook(client, BATCH_PAYLOAD, BATCH_SIGNATURE, path="/webhook/batch")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "created": 0, "duplicates": 2}
+
+
+def test_webhook_batch_metrics_units(client):
+    """Test that a batch counts once as a request and once per message."""
+    def sample(name, result):
+        return REGISTRY.get_sample_value(name, {"result": result}) or 0.0
+    
+    names = (
+        ("webhook_requests_total", "batch"),
+        ("webhook_requests_total", "created"),
+        ("webhook_messages_total", "created"),
+        ("webhook_messages_total", "duplicate"),
+    )
+    before = {key: sample(*key) for key in names}
+    
+    response = post_webhook(client, BATCH_PAYLOAD, BATCH_SIGNATURE, path="/webhook/batch")
+    assert response.status_code == 200
+    response = post_webhook(client, BATCH_PAYLOAD, BATCH_SIGNATURE, path="/webhook/batch")
+    assert response.status_code == 200
+    
+    if Config.ENABLE_METRICS:
+        delta = {key: sample(*key) - before[key] for key in names}
+        assert delta == {
+            ("webhook_requests_total", "batch"): 2,
+            ("webhook_requests_total", "created"): 0,
+            ("webhook_messages_total", "created"): 2,
+            ("webhook_messages_total", "duplicate"): 2,
+        }
+
+
+def test_webhook_batch_invalid_signature(client):
+    """Test batch ingestion with invalid signature."""
+    response = post_webhook(
+        client, INVALID_SIGNATURE_BATCH_PAYLOAD, "invalid_signature", path="/webhook/batch"
     )
     
+    assert response.status_code == 401
+    assert client.get("/messages").json()["total"] == 0
+
+
+def test_webhook_batch_empty(client):
+    """Test batch ingestion rejects an empty message list."""
+    response = post_webhook(
+        client, EMPTY_BATCH_PAYLOAD, EMPTY_BATCH_SIGNATURE, path="/webhook/batch"
+    )
     assert response.status_code == 422
+
+
+def test_webhook_signature_must_be_lowercase_hex(client):
+    """Test that uppercase or whitespace-separated hex signatures are rejected."""
+    uppercase = VALID_SIGNATURE.upper()
+    spaced = " ".join(VALID_SIGNATURE[i:i + 2] for i in range(0, len(VALID_SIGNATURE), 2))
+    
+    for signature in (uppercase, spaced, VALID_SIGNATURE + " "):
+        response = post_webhook(client, VALID_PAYLOAD, signature)
+        assert response.status_code == 401
+
+
+def test_webhook_batch_openapi_refs_resolve(client):
+    """Test that every $ref reachable from the batch request schema exists in components."""
+    spec = client.get("/openapi.json").json()
+    components = spec["components"]["schemas"]
+    body = spec["paths"]["/webhook/batch"]["post"]["requestBody"]
+    
+    pending = [body["content"]["application/json"]["schema"]]
+    seen = set()
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if ref is not None and ref not in seen:
+                assert ref.startswith("#/components/schemas/")
+                name = ref.rsplit("/", 1)[1]
+                assert name in components
+                seen.add(ref)
+                pending.append(components[name])
+            pending.extend(node.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+    
+    assert "#/components/schemas/WebhookPayload" in seen
+
+
+def test_webhook_secret_assignment_updates_verification(client, monkeypatch):
+    """Test that assigning Config.WEBHOOK_SECRET directly changes readiness and verification."""
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", "")
+    assert client.get("/health/ready").status_code == 503
+    assert post_webhook(client, VALID_PAYLOAD, VALID_SIGNATURE).status_code == 401
+    
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", "othersecret")
+    signature = generate_signature(VALID_PAYLOAD, "othersecret")
+    assert post_webhook(client, VALID_PAYLOAD, VALID_SIGNATURE).status_code == 401
+    assert post_webhook(client, VALID_PAYLOAD, signature).status_code == 200